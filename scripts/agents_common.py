@@ -0,0 +1,164 @@
+import sys
+import atexit
+import subprocess
+import os
+import platform
+import socket
+import signal
+import threading
+import shutil
+from functools import lru_cache
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+SEARXNG_COMPOSE_PATH = Path("./docker/searxng/docker-compose.yml")
+ENV_FILE = Path("./.env")
+FORCE = "--force" in sys.argv or "-f" in sys.argv
+lock_file = None  # Path of the lock currently held by this process
+lock_fd = None  # Open descriptor holding the lock while agents run
+
+# -----------------------
+# Shared helpers for start_agents.py and start_searxng_agents.py
+# -----------------------
+
+def is_port_open(host, port, timeout=0.25):
+    # Only used for localhost probes, which answer or refuse almost instantly
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def lock_file_descriptor(fd):
+    # Non-blocking exclusive lock; the OS releases it automatically when the holder exits
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    else:
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+
+def acquire_lock(lock_path):
+    global lock_file, lock_fd
+    if FORCE:
+        try:
+            lock_path.unlink()
+            print("Force flag detected. Removing existing lock and continuing.")
+        except FileNotFoundError:
+            pass
+        except PermissionError:
+            # Windows: the running instance keeps the file open, so it can't be removed
+            print("Lock is held by a running process and can't be removed. Stop it first. Exiting.")
+            exit(1)
+
+    while True:
+        fd = os.open(str(lock_path), os.O_CREAT | os.O_RDWR, 0o644)
+        try:
+            lock_file_descriptor(fd)
+        except OSError:
+            # A live process holds the lock; a dead holder's lock would already be released
+            os.close(fd)
+            print("Agents already running. Use --force flag to remove lock. Exiting.")
+            exit(0)
+
+        # The previous holder unlinks the file before releasing it, so we may have locked
+        # a file that no longer exists at lock_path. If so, start over on the current one.
+        if is_same_file(fd, lock_path):
+            break
+        os.close(fd)
+
+    # Record our PID and keep the descriptor open so the lock lasts as long as this process
+    os.ftruncate(fd, 0)
+    os.write(fd, str(os.getpid()).encode())
+    lock_file, lock_fd = lock_path, fd
+
+    # Remove the lock file however the process ends. SIGTERM would otherwise kill us
+    # without running atexit handlers; wait_for_shutdown() replaces this handler later
+    # with a graceful one.
+    atexit.register(release_lock)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+def is_same_file(fd, path):
+    # True if the open descriptor still refers to the file currently at path
+    try:
+        return os.fstat(fd).st_ino == os.stat(path).st_ino
+    except FileNotFoundError:
+        return False
+
+def remove_lock_file(path):
+    try:
+        path.unlink(missing_ok=True)
+        return True
+    except PermissionError:  # Windows can't delete a file another handle has open
+        return False
+
+def release_lock():
+    global lock_file, lock_fd
+    # Unlink while still holding the lock, so no other launcher can lock the old file
+    # between the unlink and the close. Windows refuses to delete our own open file;
+    # there we unlink after closing, and leave the file alone if a new holder has it.
+    # After a --force takeover the path is the new holder's lock file, so keep it too.
+    owns_file = lock_fd is not None and is_same_file(lock_fd, lock_file)
+    removed = not owns_file or remove_lock_file(lock_file)
+    if lock_fd is not None:
+        os.close(lock_fd)  # Closing the descriptor releases the lock
+        lock_fd = None
+    if not removed:
+        remove_lock_file(lock_file)
+    lock_file = None
+
+@lru_cache(maxsize=1)
+def detect_docker_cli():
+    if shutil.which("docker-compose"):
+        return "docker-compose"
+    elif shutil.which("docker"):
+        return "docker"
+    else:
+        print("Error: Docker CLI not found.")
+        exit(1)
+
+def compose_command(*args):
+    # "docker compose" (v2 plugin) or standalone "docker-compose" (v1)
+    docker_cli = detect_docker_cli()
+    cmd = [docker_cli, "compose"] if docker_cli == "docker" else [docker_cli]
+    return cmd + ["-f", str(SEARXNG_COMPOSE_PATH), "--env-file", str(ENV_FILE), *args]
+
+def start_searxng():
+    print("Starting SearxNG...")
+    # Compose v2 can block until the container is actually running (--wait);
+    # v1 has no such flag. Both honour COMPOSE_PARALLEL_LIMIT, which caps how
+    # many containers are created at once if the compose file grows.
+    args = ["up", "-d", "--wait"] if detect_docker_cli() == "docker" else ["up", "-d"]
+    env = dict(os.environ, COMPOSE_PARALLEL_LIMIT=str(min(4, os.cpu_count() or 2)))
+    # Only stderr is shown (on failure), so don't buffer compose's progress output
+    result = subprocess.run(
+        compose_command(*args),
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        env=env,
+    )
+    if result.returncode == 0:
+        print("SearxNG container started.")
+    else:
+        print("Warning: SearxNG may not have started correctly.")
+        print(result.stderr)
+
+def stop_searxng():
+    # Returns True when "down" succeeded, i.e. SearxNG is known to be stopped
+    result = subprocess.run(compose_command("down", "--remove-orphans"))
+    return result.returncode == 0
+
+def wait_for_shutdown():
+    stop_requested = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop_requested.set())
+
+    # Sleep until a signal arrives. Windows can't interrupt an untimed wait
+    # with Ctrl+C, so wake up periodically there to let the handler run.
+    timeout = 1 if platform.system() == "Windows" else None
+    while not stop_requested.wait(timeout):
+        pass
@@ -4,77 +4,36 @@ import time
 import os
 import platform
 import socket
+import json
+import http.client
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import shutil
+from functools import lru_cache
+
+# Shared lock/Docker helpers live one directory up in scripts/agents_common.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from agents_common import (
+    acquire_lock,
+    is_port_open,
+    release_lock,
+    start_searxng,
+    stop_searxng,
+    wait_for_shutdown,
+)
 
 LOCK_FILE = Path.home() / ".kilo_local_ai.lock"
 OLLAMA_HOST = ("127.0.0.1", 11434)
-SEARXNG_COMPOSE_PATH = Path("./docker/searxng/docker-compose.yml")
-ENV_FILE = Path("./.env")
-FORCE = "--force" in sys.argv or "-f" in sys.argv
+# Docker binary used for status queries, resolved once instead of walking $PATH per call
+DOCKER_BIN = shutil.which("docker") or shutil.which("docker-compose")
+DEFAULT_DOCKER_SOCKET = "/var/run/docker.sock"
+docker_conn = None  # Docker API connection kept open across status queries
 
 # -----------------------
 # Helper functions
 # -----------------------
 
-def is_port_open(host, port):
-    try:
-        with socket.create_connection((host, port), timeout=1):
-            return True
-    except OSError:
-        return False
-
-def acquire_lock():
-    if LOCK_FILE.exists():
-        if FORCE:
-            print("Force flag detected. Removing existing lock and continuing.")
-            LOCK_FILE.unlink()
-        else:
-            print("Lock file exists. Checking if agents are actually running...")
-
-            # Example check for Ollama
-            import socket
-            def is_port_open(host, port):
-                try:
-                    with socket.create_connection((host, port), timeout=1):
-                        return True
-                except OSError:
-                    return False
-
-            ollama_running = is_port_open("127.0.0.1", 11434)
-            import subprocess
-            searxng_running = False
-            try:
-                result = subprocess.run(
-                    ["docker-compose", "-f", str(SEARXNG_COMPOSE_PATH), "ps", "--filter", "name=searxng", "--format", "{{.Names}}"],
-                    capture_output=True, text=True
-                )
-                searxng_running = bool(result.stdout.strip())
-            except Exception:
-                pass
-
-            if not (ollama_running or searxng_running):
-                print("No agents detected. Removing stale lock file.")
-                LOCK_FILE.unlink()
-            else:
-                print("Agents already running. Use --force flag to remove lock. Exiting.")
-                exit(0)
-
-    LOCK_FILE.write_text(str(os.getpid()))
-
-def release_lock():
-    if LOCK_FILE.exists():
-        LOCK_FILE.unlink()
-
-def detect_docker_cli():
-    if shutil.which("docker-compose"):
-        return "docker-compose"
-    elif shutil.which("docker"):
-        return "docker"
-    else:
-        print("Error: Docker CLI not found.")
-        exit(1)
-
 def start_ollama():
     if is_port_open(*OLLAMA_HOST):
         print("Ollama already running (Desktop/service).")
@@ -86,91 +45,131 @@ def start_ollama():
         shell=(platform.system() == "Windows"),
     )
 
-    for _ in range(12):
+    # Poll with exponential backoff (20 ms doubling up to 0.5 s) for up to 6 s,
+    # so a fast start is noticed quickly without hammering the port
+    delay = 0.02
+    deadline = time.monotonic() + 6.0
+    while time.monotonic() < deadline:
         if is_port_open(*OLLAMA_HOST):
             print("Ollama listening on 127.0.0.1:11434")
             return
-        time.sleep(0.5)
+        time.sleep(delay)
+        delay = min(delay * 2, 0.5)
 
     print("Warning: Ollama did not become ready in time.")
 
-def start_searxng():
-    print("Starting SearxNG...")
-    docker_cli = detect_docker_cli()
-    cmd = [docker_cli, "compose", "-f", str(SEARXNG_COMPOSE_PATH),
-           "--env-file", str(ENV_FILE), "up", "-d"] if docker_cli == "docker" else \
-          [docker_cli, "-f", str(SEARXNG_COMPOSE_PATH),
-           "--env-file", str(ENV_FILE), "up", "-d"]
-
+@lru_cache(maxsize=1)
+def docker_socket_path():
+    # The daemon socket the docker CLI would use, or None when it targets something else
+    # (TCP/npipe DOCKER_HOST, or a non-default context such as rootless or Docker Desktop)
+    docker_host = os.environ.get("DOCKER_HOST")
+    if docker_host:
+        return docker_host[len("unix://"):] if docker_host.startswith("unix://") else None
+
+    context = os.environ.get("DOCKER_CONTEXT")
+    if context is None:
+        config_dir = Path(os.environ.get("DOCKER_CONFIG", Path.home() / ".docker"))
+        try:
+            context = json.loads((config_dir / "config.json").read_text()).get("currentContext")
+        except (OSError, ValueError, AttributeError):
+            context = None
+    if context not in (None, "", "default"):
+        return None
+    return DEFAULT_DOCKER_SOCKET
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    # HTTP over a Unix domain socket, used to talk to the Docker daemon directly
+    def __init__(self, socket_path, timeout=2):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+def list_searxng_containers():
+    global docker_conn
+    # Query the Docker Engine API directly when its socket is available (no CLI fork+exec),
+    # reusing one keep-alive connection for the health summary and the final status
+    docker_socket = docker_socket_path()
+    if hasattr(socket, "AF_UNIX") and docker_socket and os.path.exists(docker_socket):
+        filters = urllib.parse.quote(json.dumps({"name": ["searxng"]}))
+        if docker_conn is None:
+            docker_conn = UnixHTTPConnection(docker_socket)
+        try:
+            docker_conn.request("GET", f"/containers/json?filters={filters}")
+            response = docker_conn.getresponse()
+            body = response.read()  # Drain the response so the connection can be reused
+            if response.status == 200:
+                return [c["Names"][0].lstrip("/") for c in json.loads(body)]
+        except (OSError, http.client.HTTPException, ValueError):
+            # Drop a broken or daemon-closed connection; the next call reconnects
+            docker_conn.close()
+            docker_conn = None
+
+    if DOCKER_BIN is None:
+        return None
+    cmd = [DOCKER_BIN, "ps", "--filter", "name=searxng", "--format", "{{.Names}}"]
     result = subprocess.run(cmd, capture_output=True, text=True)
-    if result.returncode == 0:
-        print("SearxNG container started.")
-    else:
-        print("Warning: SearxNG may not have started correctly.")
-        print(result.stderr)
+    return [n.strip() for n in result.stdout.strip().splitlines() if n.strip()]
 
-def stop_searxng():
-    docker_cli = detect_docker_cli()
-    cmd = [docker_cli, "compose", "-f", str(SEARXNG_COMPOSE_PATH),
-           "--env-file", str(ENV_FILE), "down"] if docker_cli == "docker" else \
-          [docker_cli, "-f", str(SEARXNG_COMPOSE_PATH),
-           "--env-file", str(ENV_FILE), "down"]
-    subprocess.run(cmd)
+def get_searxng_status(ttl=2.0):
+    # Reuse a status checked within the last `ttl` seconds
+    if not hasattr(get_searxng_status, "last_checked"):
+        get_searxng_status.last_checked = (0.0, None)
 
-def print_health_summary():
-    print("\n===== Agent Health Summary =====")
-    print(f"Ollama: {'Running' if is_port_open(*OLLAMA_HOST) else 'Stopped'}")
+    checked_at, status = get_searxng_status.last_checked
+    if status is not None and time.monotonic() - checked_at < ttl:
+        return status
 
-    docker_cli = shutil.which("docker") or shutil.which("docker-compose")
-    if docker_cli is None:
-        print("SearxNG: Unknown (Docker not found)")
+    names = list_searxng_containers()
+    if names is None:
+        status = "Unknown (Docker not found)"
     else:
-        cmd = [docker_cli, "ps", "--filter", "name=searxng", "--format", "{{.Names}}"]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        names = [n.strip() for n in result.stdout.strip().splitlines() if n.strip()]
-        searx_status = "Running" if names else "Stopped"
-        print(f"SearxNG: {searx_status}")
+        status = "Running" if names else "Stopped"
+    get_searxng_status.last_checked = (time.monotonic(), status)
+    return status
+
+def print_status_block(title, searxng_status):
+    # Format the whole block first and emit it with one write instead of one per line
+    ollama_status = "Running" if is_port_open(*OLLAMA_HOST) else "Stopped"
+    sys.stdout.write(
+        f"\n===== {title} =====\n"
+        f"Ollama: {ollama_status}\n"
+        f"SearxNG: {searxng_status}\n"
+        "================================\n\n"
+    )
 
-    print("================================\n")
+def print_health_summary():
+    print_status_block("Agent Health Summary", get_searxng_status())
 
 def stop_agents():
     print("\nStopping agents...")
-    stop_searxng()
+    searxng_stopped = stop_searxng()
     release_lock()
     print("Agents stopped.")
 
-    # Final health summary
-    print("\n===== Final Agent Status =====")
-    print(f"Ollama: {'Running' if is_port_open(*OLLAMA_HOST) else 'Stopped'}")
-
-    docker_cli = shutil.which("docker") or shutil.which("docker-compose")
-    if docker_cli is None:
-        print("SearxNG: Unknown (Docker not found)")
-    else:
-        cmd = [docker_cli, "ps", "--filter", "name=searxng", "--format", "{{.Names}}"]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        names = [n.strip() for n in result.stdout.strip().splitlines() if n.strip()]
-        searx_status = "Running" if names else "Stopped"
-        print(f"SearxNG: {searx_status}")
-
-    print("================================\n")
+    # Final health summary; a successful "down" already tells us SearxNG is stopped
+    print_status_block("Final Agent Status", "Stopped" if searxng_stopped else get_searxng_status())
 
 # -----------------------
 # Main loop
 # -----------------------
 
 def main():
-    acquire_lock()
-    start_ollama()
-    start_searxng()
+    acquire_lock(LOCK_FILE)
+
+    # Ollama and SearxNG are independent, so bring them up concurrently
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(start_ollama), executor.submit(start_searxng)]
+    for future in futures:
+        future.result()  # Re-raise failures, e.g. exit() when Docker isn't found
     print_health_summary()
 
     print("Agents running. Press Ctrl+C to exit.")
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        stop_agents()
+    wait_for_shutdown()
+    stop_agents()
 
 if __name__ == "__main__":
     main()
@@ -2,15 +2,196 @@ import sys
 import io
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Optional
 from bs4 import BeautifulSoup
 import re
-from datetime import datetime
+from datetime import datetime, timezone
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from bisect import bisect_left
+from pathlib import Path
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Parse pages with lxml's C parser when installed, otherwise the pure-Python one
+try:
+    import lxml
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
 
 # Set stdout encoding to handle Unicode properly on Windows
 sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
 
+# Decode JSON with orjson's C parser when installed (its errors subclass json.JSONDecodeError)
+json_loads = orjson.loads if orjson is not None else json.loads
+
+# Shared HTTP session so repeated requests reuse pooled keep-alive connections
+HTTP_POOL_SIZE = 32
+SESSION = requests.Session()
+# Retry connection failures only. Read timeouts and error statuses surface immediately,
+# and Retry-After is ignored so a rate-limited page can't stall a fetch for minutes.
+HTTP_ADAPTER = HTTPAdapter(
+    pool_connections=HTTP_POOL_SIZE,
+    pool_maxsize=HTTP_POOL_SIZE,
+    max_retries=Retry(
+        total=2,
+        connect=2,
+        read=False,
+        status=0,
+        other=0,
+        respect_retry_after_header=False,
+        backoff_factor=0.2,
+    ),
+)
+SESSION.mount('http://', HTTP_ADAPTER)
+SESSION.mount('https://', HTTP_ADAPTER)
+# Browser-like headers, set once on the session rather than rebuilt per request
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    # Includes br/zstd when the matching decoders are installed
+    'Accept-Encoding': requests.utils.DEFAULT_ACCEPT_ENCODING,
+    'Connection': 'keep-alive',
+}
+SESSION.headers.update(DEFAULT_HEADERS)
+
+# Concurrent page fetches in format_results (must not exceed HTTP_POOL_SIZE)
+MAX_FETCH_WORKERS = 16
+# Upper bound on how much of a page body is downloaded and parsed
+MAX_PAGE_BYTES = 2_000_000
+
+# Search snippets at least this long are used as-is instead of fetching the page
+MIN_SNIPPET_LENGTH = 400
+
+# Optional on-disk cache of extracted pages, shared between runs
+PAGE_CACHE_TTL = 3600  # seconds
+PAGE_CACHE = diskcache.Cache(str(Path.home() / ".kilo_local_ai_page_cache")) if diskcache is not None else None
+
+# Query substrings rejected to prevent script/scheme injection
+DANGEROUS_PATTERN_RE = re.compile(r'<script|javascript:|vbscript:|data:|file:|ftp:', re.IGNORECASE)
+
+# Search engines whose results get a ranking boost in rank_results
+TRUSTED_ENGINES = frozenset({'brave', 'duckduckgo', 'startpage'})
+
+# Freshness categories: content at most FRESHNESS_MAX_DAYS[i] days old gets FRESHNESS_LABELS[i]
+FRESHNESS_MAX_DAYS = (7, 30, 90, 180, 365)
+FRESHNESS_LABELS = (
+    "Very Fresh (Less than 1 week)",
+    "Fresh (Less than 1 month)",
+    "Moderately Fresh (Less than 3 months)",
+    "Somewhat Fresh (Less than 6 months)",
+    "Aged (Less than 1 year)",
+    "Old (More than 1 year)",
+)
+
+# Domain labels (e.g. mit.edu, gov.uk) and registered domains treated as authoritative
+AUTHORITATIVE_LABELS = frozenset({"edu", "gov", "org"})
+AUTHORITATIVE_DOMAINS = frozenset({
+    "wikipedia.org", "reddit.com", "quora.com",
+    "nytimes.com", "wsj.com", "bloomberg.com", "reuters.com",
+    "nature.com", "sciencedirect.com", "springer.com",
+    "microsoft.com", "google.com", "apple.com",
+    "github.com", "stackoverflow.com", "medium.com"
+})
+# Substrings of the hostname hinting at medium or low authority
+MEDIUM_AUTHORITY_KEYWORDS = ('wikipedia', 'reddit', 'quora', 'news', 'journal')
+LOW_AUTHORITY_KEYWORDS = ('blog', 'personal', 'portfolio')
+
+# Precompiled entity patterns used by extract_entities. These stay on the stdlib engine:
+# RE2's \b and \s are ASCII-only, so it would mishandle e.g. &nbsp; and accented words.
+ORG_RE = re.compile(r'\b(?:[A-Z][a-z]+[ ]*)+(?:Inc|Corp|LLC|Ltd|Company|Associates|Partners|Group|Foundation|Institute|University|College|School|Hospital|Center|Association|Society|Board|Council|Agency|Department|Ministry|Firm|Studio|Shop|Store|Bank|Credit Union|Insurance|Clinic|Laboratory|Library|Museum|Gallery|Theater|Church|Synagogue|Mosque|Temple|Gym|Fitness|Restaurant|Cafe|Bar|Hotel|Resort|Airline|Store|Brand)\b')
+PERSON_RE = re.compile(r'\b(?:Mr\.?|Mrs\.?|Ms\.?|Dr\.?|Prof\.?|Sir|Lord|Lady)\s+[A-Z][a-z]+\s*[A-Z]*[a-z]*\b')
+DATE_RE = re.compile(r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December) \d{1,2},? \d{4}\b|\b\d{1,2}/\d{1,2}/\d{4}\b')
+STAT_RE = re.compile(r'\b\d+(?:,\d{3})*(?:\.\d+)?%? (?:billion|million|thousand|trillion|percent|hours|days|years|times|dollars|USD|EUR|GBP|cm|m|kg|lb|ft|in)\b|\b\d+%\b')
+
+# Common city names recognised by extract_entities
+LOCATIONS = frozenset({
+    "New York", "Los Angeles", "Chicago", "Houston", "Phoenix", "Philadelphia", "San Antonio",
+    "San Diego", "Dallas", "San Jose", "Austin", "Jacksonville", "Fort Worth", "Columbus",
+    "Charlotte", "San Francisco", "Indianapolis", "Seattle", "Denver", "Washington", "Boston",
+    "El Paso", "Nashville", "Detroit", "Oklahoma City", "Portland", "Las Vegas", "Memphis",
+    "Louisville", "Baltimore", "Milwaukee", "Albuquerque", "Tucson", "Fresno", "Sacramento", "Mesa",
+    "Atlanta", "Kansas City", "Colorado Springs", "Miami", "Raleigh", "Omaha", "Long Beach",
+    "Virginia Beach", "Oakland", "Minneapolis", "Tulsa", "Arlington", "Tampa", "New Orleans",
+    "Wichita", "Cleveland", "Aurora", "Anaheim", "Honolulu", "Santa Ana", "Riverside",
+    "Corpus Christi", "Lexington", "Stockton", "Henderson", "St. Paul", "St. Louis", "Cincinnati",
+    "Pittsburgh", "Greensboro", "Lincoln", "Plano", "Anchorage", "Orlando", "Irvine", "Newark",
+    "Chula Vista", "Toledo", "Fort Wayne", "St. Petersburg", "Laredo", "Chandler", "Scottsdale",
+    "Madison", "Gilbert", "Glendale", "North Las Vegas", "Winston", "Jersey City", "Chesapeake",
+    "Norfolk", "Fremont", "Garland", "Irving", "Hialeah", "Richmond", "Boise", "Spokane",
+    "Baton Rouge", "Modesto", "Fontana", "Oxnard", "Fayetteville", "Tacoma", "Montgomery",
+    "Des Moines", "Shreveport", "Yonkers", "Akron", "Little Rock", "Salt Lake City", "Huntsville",
+    "Grand Rapids", "Tallahassee", "Hollywood", "Knoxville", "Grand Prairie", "Worcester",
+    "Newport News", "Brownsville", "Santa Clarita", "Providence", "Fort Lauderdale", "Rochester",
+    "Dayton", "Chattanooga", "Cape Coral", "Vancouver", "Lakewood", "Hendersonville", "Carmel",
+    "Champaign", "Peoria", "Olathe", "Springfield", "Santa Rosa", "Rockford", "Salem", "Eugene",
+    "Gresham", "Cambridge", "Thousand Oaks", "Oceanside", "Columbia", "Elk Grove", "Pomona",
+    "Pasadena", "Salinas", "Naperville", "Joliet", "Bellevue", "Sandy Springs", "Bridgeport",
+    "Clarksville", "Carrollton", "Allentown", "Round Rock", "Lowell", "Sunnyvale", "Coral Springs",
+    "Elizabeth", "Hartford", "Thibodaux", "Lafayette", "Evansville", "Odessa", "Carson",
+    "Roseville", "Charleston", "Beaumont", "Independence", "Simi Valley", "Santa Clara",
+    "Lancaster", "Athens", "Vallejo", "Ann Arbor", "Provo", "Fairfield", "Ventura", "Arvada",
+    "Compton", "Frisco", "Visalia", "Vacaville", "Cary", "Costa Mesa", "Manchester", "Berkeley",
+    "Miami Gardens", "Midland", "Downey", "Norwalk", "Pueblo", "Everett", "Tempe", "Gainesville",
+    "Westminster", "Wilmington", "Daly City", "Burbank", "Richardson", "Pompano Beach",
+    "North Charleston", "Broken Arrow", "Pearland", "El Monte", "Las Cruces", "Davenport", "Rialto",
+    "San Bernardino", "Camden", "South Bend", "Clovis", "Jurupa Valley", "West Jordan", "Hillsboro",
+    "Collinsville", "Palm Bay", "Euclid", "High Point", "Waco", "Erie", "Denton", "Antioch",
+    "Rosemont", "Miami Beach", "Sugar Land", "Waterbury", "Santee", "Saginaw", "Mission", "Chico",
+    "Burnsville", "Lee's Summit", "El Cajon", "Cupertino", "Renton", "Vista", "Danbury",
+    "Midwest City", "San Marcos", "Waukegan", "Edison", "Lawrence", "Carlsbad", "Fall River",
+    "Palm Coast", "Boulder", "New Bedford", "Plantation", "Troy", "Bellflower", "Agawam",
+    "Portsmouth", "Centennial", "Lakeland", "Marietta", "Albany", "Inglewood", "Billings",
+    "Kenosha", "Brockton", "Davis", "Peachtree Corners", "Largo", "Southfield", "Lynchburg",
+    "Hoover", "Fargo", "Stamford", "Flint", "Pleasanton", "Tustin", "Hackensack", "Green Bay",
+    "Canton", "Perris", "Waukesha", "Redding", "Sparks", "Dublin", "Newton", "San Leandro",
+    "Casa Grande", "Hemet", "Jonesboro", "Federal Way", "Paramount", "Lorain", "Union City",
+    "Anderson", "Palmdale", "Grand Junction", "Missoula", "Palm Springs", "Redwood City", "Warwick",
+    "DeKalb", "Arden-Arcade", "Norman", "East Orange", "Belleville", "West Covina", "Clearwater",
+    "Carson City", "Cranston", "West Palm Beach", "Royal Oak", "Port St. Lucie", "Novato",
+    "Dearborn", "Tamarac", "Manhattan", "Springdale", "Idaho Falls", "Concord", "Pembroke Pines",
+    "Terre Haute", "Tyler", "Conway", "Pico Rivera", "East Lansing", "Lansing", "Redlands", "Bryan",
+    "Orem", "Meridian", "Mission Viejo", "Sarasota", "Miramar", "Madera", "Medford", "St. Joseph",
+    "San Angelo", "Lehigh Acres", "San Bruno", "San Tan Valley", "Pensacola", "Lehi", "Bolingbrook",
+    "Lombard", "Manteca", "Puyallup", "Ellicott City", "Greenwood", "Suffolk", "Palm Desert",
+    "South Jordan", "Carol Stream", "Cathedral City", "Oak Lawn", "Deltona", "Casper", "Lompoc",
+    "Gilroy", "Duluth", "South Lyon", "Petaluma", "National City", "Wheaton", "Hoboken", "La Habra",
+    "Watsonville", "Lynnwood", "Keller", "Chambersburg", "Palm Beach Gardens", "Muskegon",
+    "Cleveland Heights", "Pine Bluff", "Linden", "Campbell", "Urbana", "Lodi", "Conyers", "Lacey",
+    "Baytown", "Pittsburg", "Burien", "Layton", "Lauderhill", "Highland", "Laguna Nueva",
+    "Minnetonka", "Lauderdale Lakes", "Pahrump"
+})
+
+if ahocorasick is not None:
+    # Aho-Corasick finds every city in a single linear scan of the text
+    LOCATION_AUTOMATON = ahocorasick.Automaton()
+    for location in LOCATIONS:
+        LOCATION_AUTOMATON.add_word(location, location)
+    LOCATION_AUTOMATON.make_automaton()
+else:
+    LOCATION_AUTOMATON = None
+    # Longest names first so e.g. "Miami Beach" is preferred over "Miami"
+    location_alternation = '|'.join(re.escape(location) for location in sorted(LOCATIONS, key=lambda l: (-len(l), l)))
+    LOCATION_RE = re.compile(rf'\b(?:{location_alternation})\b')
+
 def search_searxng(query: str, num_results: Optional[int] = None) -> dict:
     """
     Search using the local SearXNG instance
@@ -30,11 +211,10 @@ def search_searxng(query: str, num_results: Optional[int] = None) -> dict:
         return {}
     
     # Validate query to prevent injection
-    dangerous_patterns = ['<script', 'javascript:', 'vbscript:', 'data:', 'file:', 'ftp:']
-    for pattern in dangerous_patterns:
-        if pattern.lower() in query.lower():
-            print(f"Error: Query contains potentially dangerous pattern: {pattern}")
-            return {}
+    pattern = find_dangerous_pattern(query)
+    if pattern:
+        print(f"Error: Query contains potentially dangerous pattern: {pattern}")
+        return {}
     
     url = "http://localhost:18080/search"
     params = {
@@ -43,9 +223,9 @@ def search_searxng(query: str, num_results: Optional[int] = None) -> dict:
     }
 
     try:
-        response = requests.get(url, params=params, timeout=10)  # Add timeout
+        response = SESSION.get(url, params=params, timeout=10)  # Add timeout
         response.raise_for_status()
-        results = response.json()
+        results = json_loads(response.content)
         
         # Limit results if specified
         if num_results and 'results' in results:
@@ -76,24 +256,26 @@ def chunk_content(text: str, max_length: int) -> str:
     if len(text) <= max_length:
         return text
     
-    # Try to find a good breaking point
-    truncated = text[:max_length]
+    # Try to find a good breaking point. The searches are bounded by max_length
+    # directly, so the text is only sliced once, at the chosen break.
     
-    # Look for the last sentence ending before max_length
-    sentence_endings = [truncated.rfind('.'), truncated.rfind('!'), truncated.rfind('?')]
+    # Look for the last sentence ending before max_length, only scanning the
+    # tail where a break would be accepted (at least 80% of the way through)
+    sentence_start = int(max_length * 0.8) + 1
+    sentence_endings = [text.rfind('.', sentence_start, max_length), text.rfind('!', sentence_start, max_length), text.rfind('?', sentence_start, max_length)]
     best_break = max(sentence_endings)
     
     # If we found a sentence ending that's reasonably close to the limit, use it
-    if best_break > max_length * 0.8:  # At least 80% of the way through
-        return truncated[:best_break+1]
+    if best_break >= 0:
+        return text[:best_break+1]
     
-    # Otherwise, look for a paragraph break
-    para_break = truncated.rfind('\n\n')
-    if para_break > max_length * 0.7:  # At least 70% of the way through
-        return truncated[:para_break]
+    # Otherwise, look for a paragraph break at least 70% of the way through
+    para_break = text.rfind('\n\n', int(max_length * 0.7) + 1, max_length)
+    if para_break >= 0:
+        return text[:para_break]
     
     # If no good break point found, just truncate at max_length
-    return truncated
+    return text[:max_length]
 
 def rank_results(results: dict) -> dict:
     """
@@ -118,20 +300,18 @@ def rank_results(results: dict) -> dict:
             score += 10
         
         # Boost for having detailed content
-        content = result.get('content', '')
-        if len(content) > 500:  # Longer content gets higher score
+        content_length = len(result.get('content', ''))
+        if content_length > 500:  # Longer content gets higher score
             score += 5
-        elif len(content) > 200:
+        elif content_length > 200:
             score += 2
         
         # Boost for having a meaningful title
-        title = result.get('title', '')
-        if len(title) > 10:
+        if len(result.get('title', '')) > 10:
             score += 3
         
         # Boost for trusted sources (based on engine)
-        engine = result.get('engine', '')
-        if engine in ['brave', 'duckduckgo', 'startpage']:
+        if result.get('engine', '') in TRUSTED_ENGINES:
             score += 2
         
         return score
@@ -142,6 +322,42 @@ def rank_results(results: dict) -> dict:
     
     return ranked_results
 
+def find_locations(text: str) -> list:
+    """
+    Find known city names in the text
+    
+    Args:
+        text: The text to search
+    
+    Returns:
+        List of matched city names (may contain duplicates)
+    """
+    if LOCATION_AUTOMATON is not None:
+        # iter() reports every occurrence, so a shorter city is still found when a longer
+        # one fails the word-boundary check (e.g. "Miami" in "Miami Beaches")
+        longest_at = {}
+        for end, location in LOCATION_AUTOMATON.iter(text):
+            start = end - len(location) + 1
+            # Only accept whole-word matches, like \b in the regex patterns
+            if start > 0 and (text[start - 1].isalnum() or text[start - 1] == '_'):
+                continue
+            if end + 1 < len(text) and (text[end + 1].isalnum() or text[end + 1] == '_'):
+                continue
+            if len(location) > len(longest_at.get(start, '')):
+                longest_at[start] = location
+        
+        # Scan left to right taking the longest city at each start, without overlaps,
+        # which is what the regex fallback's longest-first alternation does
+        matches = []
+        next_start = 0
+        for start in sorted(longest_at):
+            if start >= next_start:
+                matches.append(longest_at[start])
+                next_start = start + len(longest_at[start])
+        return matches
+    
+    return LOCATION_RE.findall(text)
+
 def extract_entities(text: str) -> list:
     """
     Extract key entities from content to help LLMs better understand context
@@ -152,74 +368,73 @@ def extract_entities(text: str) -> list:
     Returns:
         List of extracted entities
     """
-    entities = []
+    # Accumulate into a single set so duplicates are dropped as we go
+    entities = set()
     
     # Extract potential organizations (common company names)
-    org_pattern = r'\b(?:[A-Z][a-z]+[ ]*)+(?:Inc|Corp|LLC|Ltd|Company|Associates|Partners|Group|Foundation|Institute|University|College|School|Hospital|Center|Association|Society|Board|Council|Agency|Department|Ministry|Firm|Studio|Shop|Store|Bank|Credit Union|Insurance|Clinic|Laboratory|Library|Museum|Gallery|Theater|Church|Synagogue|Mosque|Temple|Gym|Fitness|Restaurant|Cafe|Bar|Hotel|Resort|Airline|Store|Brand)\b'
-    org_matches = re.findall(org_pattern, text)
-    entities.extend(list(set(org_matches)))  # Remove duplicates
+    entities.update(ORG_RE.findall(text))
     
     # Extract potential person names (Mr./Ms. followed by capitalized name)
-    person_pattern = r'\b(?:Mr\.?|Mrs\.?|Ms\.?|Dr\.?|Prof\.?|Sir|Lord|Lady)\s+[A-Z][a-z]+\s*[A-Z]*[a-z]*\b'
-    person_matches = re.findall(person_pattern, text)
-    entities.extend(list(set(person_matches)))
+    entities.update(PERSON_RE.findall(text))
     
     # Extract potential locations (common city names)
-    location_pattern = r'\b(?:New York|Los Angeles|Chicago|Houston|Phoenix|Philadelphia|San Antonio|San Diego|Dallas|San Jose|Austin|Jacksonville|Fort Worth|Columbus|Charlotte|San Francisco|Indianapolis|Seattle|Denver|Washington|Boston|El Paso|Nashville|Detroit|Oklahoma City|Portland|Las Vegas|Memphis|Louisville|Baltimore|Milwaukee|Albuquerque|Tucson|Fresno|Sacramento|Mesa|Atlanta|Kansas City|Colorado Springs|Miami|Raleigh|Omaha|Long Beach|Virginia Beach|Oakland|Minneapolis|Tulsa|Arlington|Tampa|New Orleans|Wichita|Cleveland|Aurora|Anaheim|Honolulu|Santa Ana|Riverside|Corpus Christi|Lexington|Stockton|Henderson|St. Paul|St. Louis|Cincinnati|Pittsburgh|Greensboro|Lincoln|Plano|Anchorage|Orlando|Irvine|Newark|Chula Vista|Toledo|Fort Wayne|St. Petersburg|Laredo|Chandler|Scottsdale|Madison|Gilbert|Glendale|North Las Vegas|Winston|Jersey City|Chesapeake|Norfolk|Fremont|Garland|Irving|Hialeah|Richmond|Boise|Spokane|Baton Rouge|Modesto|Fontana|Oxnard|Fayetteville|Tacoma|Glendale|Montgomery|Des Moines|Shreveport|Aurora|Yonkers|Akron|Little Rock|Salt Lake City|Huntsville|Grand Rapids|Tallahassee|Hollywood|Knoxville|Grand Prairie|Worcester|Newport News|Brownsville|Santa Clarita|Providence|Fort Lauderdale|Rochester|Dayton|Chattanooga|Cape Coral|Vancouver|Lakewood|Hendersonville|Carmel|Champaign|Peoria|Olathe|Springfield|Santa Rosa|Rockford|Salem|Eugene|Gresham|Cambridge|Thousand Oaks|Oceanside|Columbia|Elk Grove|Pomona|Pasadena|Salinas|Naperville|Joliet|Bellevue|Sandy Springs|Bridgeport|Clarksville|Carrollton|Allentown|Columbia|Round Rock|Lowell|Sunnyvale|Coral Springs|Elizabeth|Hartford|Thibodaux|Lafayette|Evansville|Odessa|Carson|Roseville|Charleston|Beaumont|Independence|Simi Valley|Santa Clara|Lancaster|Athens|Vallejo|Ann Arbor|Provo|Fairfield|Ventura|Arvada|Compton|Frisco|Visalia|Vacaville|Cary|Costa Mesa|Manchester|Berkeley|Miami Gardens|Midland|Downey|Norwalk|Pueblo|Everett|Tempe|Gainesville|Westminster|Wilmington|Daly City|Burbank|Richardson|Pompano Beach|North Charleston|Broken Arrow|Pearland|El Monte|Las Cruces|Davenport|Rialto|San Bernardino|Camden|South Bend|Clovis|Jurupa Valley|West Jordan|Hillsboro|Collinsville|Palm Bay|Euclid|High Point|Rochester|Waco|Erie|Denton|Antioch|Rosemont|Miami Beach|Sugar Land|Waterbury|Santee|Saginaw|Mission|Chico|Burnsville|Lee\'s Summit|El Cajon|Cupertino|Renton|Vista|Danbury|Midwest City|San Marcos|Waukegan|Edison|Lawrence|Carlsbad|Fall River|Palm Coast|Boulder|Gresham|New Bedford|Plantation|Troy|Bellflower|Agawam|Portsmouth|Centennial|Lakeland|Marietta|Albany|Inglewood|Round Rock|Billings|Kenosha|Odessa|Palm Coast|Brockton|Davis|Peachtree Corners|Largo|Southfield|Lynchburg|Hoover|Fargo|Stamford|Flint|Pleasanton|Tustin|Hackensack|Green Bay|Canton|Perris|Waukesha|Redding|Sparks|Dublin|Newton|San Leandro|Salem|Champaign|Casa Grande|Hemet|Jonesboro|Federal Way|Paramount|Lorain|Union City|Anderson|Palmdale|Grand Junction|Missoula|Palm Springs|Redwood City|Warwick|DeKalb|Athens|Arden-Arcade|Norman|East Orange|Pompano Beach|Belleville|West Covina|Clearwater|Carson City|Cranston|West Palm Beach|Royal Oak|Port St. Lucie|Novato|Dearborn|Tamarac|Manhattan|Lawrence|Springdale|Idaho Falls|Concord|Pembroke Pines|Terre Haute|Tyler|Conway|Pico Rivera|East Lansing|Simi Valley|Lansing|Athens|Henderson|Redlands|Bryan|Orem|Largo|Meridian|Sandy Springs|Mission Viejo|Sarasota|Miramar|Madera|Champaign|Westminster|Cupertino|Fairfield|Medford|St. Joseph|Oakland|San Angelo|Pueblo|Lehigh Acres|San Bruno|Newark|San Tan Valley|Pensacola|Lehi|Bolingbrook|Lombard|Manteca|Puyallup|Ellicott City|Carson|Greenwood|Suffolk|Palm Desert|South Jordan|Round Rock|Carol Stream|Cathedral City|Oak Lawn|Saginaw|Deltona|Casper|Lompoc|Lancaster|Gilroy|Duluth|South Lyon|Petaluma|National City|Wheaton|Norwalk|Pensacola|Hoboken|La Habra|Watsonville|Norwalk|Union City|Lynnwood|Keller|Chambersburg|Palm Beach Gardens|Muskegon|Cleveland Heights|Pine Bluff|Linden|Troy|Campbell|Urbana|Lodi|Conway|Midland|Cleveland|Conyers|Lacey|Lancaster|Baytown|Pittsburg|Everett|Burien|Layton|Lancaster|Lauderhill|Highland|Laguna Nueva|Minnetonka|Lancaster|Lauderdale Lakes|Pahrump|Lancaster|Lakewood|Lancaster)\b'
-    location_matches = re.findall(location_pattern, text)
-    entities.extend(list(set(location_matches)))
+    entities.update(find_locations(text))
     
     # Extract potential dates
-    date_pattern = r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December) \d{1,2},? \d{4}\b|\b\d{1,2}/\d{1,2}/\d{4}\b'
-    date_matches = re.findall(date_pattern, text)
-    entities.extend(list(set(date_matches)))
+    entities.update(DATE_RE.findall(text))
     
     # Extract potential statistics and numbers with context
-    stat_pattern = r'\b\d+(?:,\d{3})*(?:\.\d+)?%? (?:billion|million|thousand|trillion|percent|hours|days|years|times|dollars|USD|EUR|GBP|cm|m|kg|lb|ft|in)\b|\b\d+%\b'
-    stat_matches = re.findall(stat_pattern, text)
-    entities.extend(list(set(stat_matches)))
+    entities.update(STAT_RE.findall(text))
     
-    # Remove duplicates and return
-    return list(set(entities))
+    return list(entities)
 
-def calculate_content_freshness(date_str: str) -> str:
+@lru_cache(maxsize=1024)
+def parse_date(date_str: str) -> Optional[datetime]:
     """
-    Calculate and categorize how fresh the content is
+    Parse an ISO-8601 or YYYY-MM-DD date string (cached per string)
     
     Args:
         date_str: Date string from the content
     
     Returns:
-        Freshness category
+        Timezone-aware datetime (UTC when no offset is given), or None if unparseable
     """
-    if not date_str:
-        return "Unknown"
-    
     try:
-        # Parse the date string
         if "T" in date_str:
             pub_date = datetime.fromisoformat(date_str.replace("Z", "+00:00"))
         else:
             pub_date = datetime.strptime(date_str, "%Y-%m-%d")
-        
-        # Calculate how old the content is
-        now = datetime.now()
-        days_old = (now - pub_date).days
-        
-        if days_old <= 7:
-            return "Very Fresh (Less than 1 week)"
-        elif days_old <= 30:
-            return "Fresh (Less than 1 month)"
-        elif days_old <= 90:
-            return "Moderately Fresh (Less than 3 months)"
-        elif days_old <= 180:
-            return "Somewhat Fresh (Less than 6 months)"
-        elif days_old <= 365:
-            return "Aged (Less than 1 year)"
-        else:
-            return "Old (More than 1 year)"
-    except:
+    except (TypeError, ValueError):
+        return None
+    
+    if pub_date.tzinfo is None:
+        pub_date = pub_date.replace(tzinfo=timezone.utc)
+    return pub_date
+
+def calculate_content_freshness(date_str: str, now: Optional[datetime] = None) -> str:
+    """
+    Calculate and categorize how fresh the content is
+    
+    Args:
+        date_str: Date string from the content
+        now: Optional timezone-aware reference time, so a batch of results shares one clock read
+    
+    Returns:
+        Freshness category
+    """
+    if not date_str:
+        return "Unknown"
+    
+    pub_date = parse_date(date_str)
+    if pub_date is None:
         return "Unknown"
+    
+    # Calculate how old the content is
+    if now is None:
+        now = datetime.now(timezone.utc)
+    days_old = (now - pub_date).days
+    
+    return FRESHNESS_LABELS[bisect_left(FRESHNESS_MAX_DAYS, days_old)]
 
 def assess_authority_signals(url: str) -> dict:
     """
@@ -234,7 +449,10 @@ def assess_authority_signals(url: str) -> dict:
     # For this implementation, we'll return basic indicators
     # In a more sophisticated implementation, we'd use APIs or web scraping
     parsed_url = urllib.parse.urlparse(url)
-    domain = parsed_url.netloc
+    domain = parsed_url.hostname or ""
+    labels = domain.split('.')
+    # The hostname and all of its parent domains, e.g. en.wikipedia.org -> wikipedia.org -> org
+    parent_domains = {'.'.join(labels[i:]) for i in range(len(labels))}
     
     # Simple heuristic-based authority assessment
     authority_indicators = {
@@ -243,39 +461,91 @@ def assess_authority_signals(url: str) -> dict:
         "content_quality_indicator": "medium"
     }
     
-    # Known authoritative domains
-    authoritative_domains = [
-        "edu", "gov", "org", 
-        "wikipedia.org", "reddit.com", "quora.com",
-        "nytimes.com", "wsj.com", "bloomberg.com", "reuters.com",
-        "nature.com", "sciencedirect.com", "springer.com",
-        "microsoft.com", "google.com", "apple.com",
-        "github.com", "stackoverflow.com", "medium.com"
-    ]
-    
-    found_authority = False
-    for auth_domain in authoritative_domains:
-        if auth_domain in domain:
-            authority_indicators["domain_reputation"] = "high"
-            authority_indicators["likely_trusted_source"] = True
-            authority_indicators["content_quality_indicator"] = "high"
-            found_authority = True
-            break
-    
-    if not found_authority:
-        if any(ext in domain for ext in ['.edu', '.gov']):
-            authority_indicators["domain_reputation"] = "high"
-            authority_indicators["likely_trusted_source"] = True
-            authority_indicators["content_quality_indicator"] = "high"
-        elif any(keyword in domain for keyword in ['wikipedia', 'reddit', 'quora', 'news', 'journal']):
-            authority_indicators["domain_reputation"] = "medium_high"
-            authority_indicators["content_quality_indicator"] = "medium_high"
-        elif any(keyword in domain for keyword in ['blog', 'personal', 'portfolio']):
-            authority_indicators["domain_reputation"] = "low_medium"
-            authority_indicators["content_quality_indicator"] = "low_medium"
+    if not AUTHORITATIVE_LABELS.isdisjoint(labels) or not AUTHORITATIVE_DOMAINS.isdisjoint(parent_domains):
+        authority_indicators["domain_reputation"] = "high"
+        authority_indicators["likely_trusted_source"] = True
+        authority_indicators["content_quality_indicator"] = "high"
+    elif any(keyword in domain for keyword in MEDIUM_AUTHORITY_KEYWORDS):
+        authority_indicators["domain_reputation"] = "medium_high"
+        authority_indicators["content_quality_indicator"] = "medium_high"
+    elif any(keyword in domain for keyword in LOW_AUTHORITY_KEYWORDS):
+        authority_indicators["domain_reputation"] = "low_medium"
+        authority_indicators["content_quality_indicator"] = "low_medium"
     
     return authority_indicators
 
+@lru_cache(maxsize=256)
+def fetch_page_text(url: str) -> str:
+    """
+    Fetch a webpage and extract its metadata and main text, without truncation
+    
+    Results are cached per URL in memory and, when diskcache is installed, on disk
+    for PAGE_CACHE_TTL seconds. Errors are raised rather than cached.
+    
+    Args:
+        url: URL of the webpage to fetch (must already be validated)
+    
+    Returns:
+        Metadata header followed by the extracted page text
+    """
+    if PAGE_CACHE is not None:
+        cached = PAGE_CACHE.get(url)
+        if cached is not None:
+            return cached
+    
+    # Stream the body and stop reading at MAX_PAGE_BYTES; content is truncated to max_length anyway
+    with SESSION.get(url, timeout=15, stream=True) as response:
+        response.raise_for_status()
+        body = response.raw.read(MAX_PAGE_BYTES, decode_content=True)
+    
+    soup = BeautifulSoup(body, HTML_PARSER)
+    
+    # Extract metadata
+    title_tag = soup.find('title')
+    title = title_tag.get_text().strip() if title_tag else "No Title"
+    
+    # Extract author if available
+    author = ""
+    author_tag = soup.find('meta', attrs={'name': 'author'}) or soup.find('meta', attrs={'property': 'article:author'}) or soup.find('meta', attrs={'name': 'by'})
+    if author_tag:
+        author = author_tag.get('content', '')
+    
+    # Extract publication date if available
+    date = ""
+    date_tag = soup.find('meta', attrs={'name': 'date'}) or soup.find('meta', attrs={'property': 'article:published_time'}) or soup.find('time')
+    if date_tag:
+        date = date_tag.get('content', '') or date_tag.get_text().strip()
+    
+    # Remove script and style elements
+    for script in soup(["script", "style"]):
+        script.decompose()
+    
+    # Try to get main content from common content containers
+    main_content = soup.find('main') or soup.find('article') or soup.find('div', class_='content') or soup.find('div', id='content') or soup.find('div', class_='post') or soup.find('div', class_='entry-content') or soup.find('div', class_='container')
+    
+    if main_content:
+        text = main_content.get_text()
+    else:
+        text = soup.get_text()
+    
+    # Clean up text - strip each line and drop empty ones in a single pass
+    text = "\n".join(line for line in (raw_line.strip() for raw_line in text.splitlines()) if line)
+    
+    # Add metadata to the content
+    metadata = f"Title: {title}"
+    if author:
+        metadata += f"\nAuthor: {author}"
+    if date:
+        metadata += f"\nDate: {date}"
+        freshness = calculate_content_freshness(date)
+        metadata += f"\nContent Freshness: {freshness}"
+    
+    full_content = f"{metadata}\n\n{text}"
+    
+    if PAGE_CACHE is not None:
+        PAGE_CACHE.set(url, full_content, expire=PAGE_CACHE_TTL)
+    return full_content
+
 def get_page_content(url: str, max_length: int = 8000) -> str:
     """
     Fetch and extract the main content from a webpage
@@ -291,62 +561,7 @@ def get_page_content(url: str, max_length: int = 8000) -> str:
         # Validate URL before fetching
         validate_url(url)
         
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.5',
-            'Accept-Encoding': 'gzip, deflate',
-            'Connection': 'keep-alive',
-        }
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
-        # Extract metadata
-        title_tag = soup.find('title')
-        title = title_tag.get_text().strip() if title_tag else "No Title"
-        
-        # Extract author if available
-        author = ""
-        author_tag = soup.find('meta', attrs={'name': 'author'}) or soup.find('meta', attrs={'property': 'article:author'}) or soup.find('meta', attrs={'name': 'by'})
-        if author_tag:
-            author = author_tag.get('content', '')
-        
-        # Extract publication date if available
-        date = ""
-        date_tag = soup.find('meta', attrs={'name': 'date'}) or soup.find('meta', attrs={'property': 'article:published_time'}) or soup.find('time')
-        if date_tag:
-            date = date_tag.get('content', '') or date_tag.get_text().strip()
-        
-        # Remove script and style elements
-        for script in soup(["script", "style"]):
-            script.decompose()
-        
-        # Try to get main content from common content containers
-        main_content = soup.find('main') or soup.find('article') or soup.find('div', class_='content') or soup.find('div', id='content') or soup.find('div', class_='post') or soup.find('div', class_='entry-content') or soup.find('div', class_='container')
-        
-        if main_content:
-            text = main_content.get_text()
-        else:
-            text = soup.get_text()
-        
-        # Clean up text - preserve paragraph breaks for better LLM understanding
-        lines = (line.strip() for line in text.splitlines())
-        # Filter out empty lines but keep paragraph structure
-        clean_lines = [line for line in lines if line]
-        text = "\n".join(clean_lines)
-        
-        # Add metadata to the content
-        metadata = f"Title: {title}"
-        if author:
-            metadata += f"\nAuthor: {author}"
-        if date:
-            metadata += f"\nDate: {date}"
-            freshness = calculate_content_freshness(date)
-            metadata += f"\nContent Freshness: {freshness}"
-        
-        full_content = f"{metadata}\n\n{text}"
+        full_content = fetch_page_text(url)
         
         # Use the intelligent chunking function
         chunked_content = chunk_content(full_content, max_length)
@@ -364,7 +579,28 @@ def get_page_content(url: str, max_length: int = 8000) -> str:
         # If direct fetching fails, return an error message
         return f"Error: Failed to fetch content from {url} - {str(e)}"
 
-def format_results(results: dict, include_full_content: bool = False, fetch_content: bool = True) -> str:
+def fetch_pages(urls: list) -> list:
+    """
+    Fetch several webpages concurrently over the shared session
+    
+    Args:
+        urls: URLs of the webpages to fetch
+    
+    Returns:
+        Extracted content (or error message) for each URL, in the same order
+    """
+    if not urls:
+        return []
+    
+    # Concurrent duplicates would all miss the page cache together, so fetch each URL once
+    unique_urls = list(dict.fromkeys(urls))
+    
+    # Network waits overlap across threads; pooled keep-alive connections are reused
+    with ThreadPoolExecutor(max_workers=min(MAX_FETCH_WORKERS, len(unique_urls))) as executor:
+        pages = dict(zip(unique_urls, executor.map(get_page_content, unique_urls)))
+    return [pages[url] for url in urls]
+
+def format_results(results: dict, include_full_content: bool = False, fetch_content: bool = True, force_fetch: bool = False) -> str:
     """
     Format search results for better readability
     
@@ -372,6 +608,7 @@ def format_results(results: dict, include_full_content: bool = False, fetch_cont
         results: Dictionary containing search results
         include_full_content: Whether to include full content or just snippets
         fetch_content: Whether to fetch actual content from URLs
+        force_fetch: Fetch every URL, even when the search snippet is already long enough
     
     Returns:
         Formatted string of search results
@@ -384,42 +621,59 @@ def format_results(results: dict, include_full_content: bool = False, fetch_cont
     formatted_output.append(f"Total Results: {results.get('number_of_results', len(results.get('results', [])))}\n")
     formatted_output.append("="*50 + "\n")  # Separator for better readability
     
+    # Score every result's freshness against the same clock reading
+    now = datetime.now(timezone.utc)
+    
+    # Fetch all pages concurrently up front; the loop below only formats them.
+    # Snippets that are already long enough are used as-is instead of fetching the page.
+    pages = []
+    if fetch_content:
+        needs_fetch = [force_fetch or len(result.get('content', '')) < MIN_SNIPPET_LENGTH for result in results['results']]
+        fetched = iter(fetch_pages([result.get('url', '') for result, fetch in zip(results['results'], needs_fetch) if fetch]))
+        pages = [next(fetched) if fetch else result.get('content', '') for result, fetch in zip(results['results'], needs_fetch)]
+    
     for i, result in enumerate(results['results'], 1):
-        formatted_output.append(f"Result {i}: {result.get('title', 'No Title')}")
-        formatted_output.append(f"URL: {result.get('url', 'No URL')}")
+        title = result.get('title', 'No Title')
+        url = result.get('url', 'No URL')
         
         if fetch_content:
-            page_content = get_page_content(result.get('url', ''))
+            page_content = pages[i - 1]
             # If we couldn't fetch content, fall back to the original content
             if page_content.strip() == "":
                 content = result.get('content', 'No content available')
-                formatted_output.append(f"Content: {content[:500]}...")  # Extended snippet
+                content_block = f"Content: {content[:500]}..."  # Extended snippet
             else:
-                formatted_output.append(f"Content:\n{page_content}")
+                content_block = f"Content:\n{page_content}"
                 
                 # Extract and display entities for LLM understanding
                 entities = extract_entities(page_content)
                 if entities:
-                    formatted_output.append(f"\nKey Entities Identified: {', '.join(entities[:10])}")  # Limit to first 10 entities
+                    content_block += f"\n\nKey Entities Identified: {', '.join(entities[:10])}"  # Limit to first 10 entities
         else:
             content = result.get('content', 'No content available')
             if include_full_content:
-                formatted_output.append(f"Content: {content}")
+                content_block = f"Content: {content}"
             else:
-                formatted_output.append(f"Content: {content[:500]}...") # Extended snippet
-            
+                content_block = f"Content: {content[:500]}..." # Extended snippet
+        
+        date_block = ""
         if result.get('publishedDate'):
-            formatted_output.append(f"Date: {result.get('publishedDate')}")
-            freshness = calculate_content_freshness(result.get('publishedDate'))
-            formatted_output.append(f"Content Freshness: {freshness}")
+            freshness = calculate_content_freshness(result.get('publishedDate'), now)
+            date_block = f"Date: {result.get('publishedDate')}\nContent Freshness: {freshness}\n"
         
         # Add authority signals
         authority_signals = assess_authority_signals(result.get('url', ''))
-        formatted_output.append(f"Authority Indicators: {authority_signals['domain_reputation']} reputation domain")
         
-        formatted_output.append(f"Source Engine: {result.get('engine', 'Unknown')}")
-        formatted_output.append(f"Citation Format: [{i}] {result.get('title', 'No Title')} - {result.get('url', 'No URL')}")
-        formatted_output.append("")  # Empty line for readability
+        # Build each result as a single block (trailing newline leaves an empty line for readability)
+        formatted_output.append(
+            f"Result {i}: {title}\n"
+            f"URL: {url}\n"
+            f"{content_block}\n"
+            f"{date_block}"
+            f"Authority Indicators: {authority_signals['domain_reputation']} reputation domain\n"
+            f"Source Engine: {result.get('engine', 'Unknown')}\n"
+            f"Citation Format: [{i}] {title} - {url}\n"
+        )
     
     # Add a summary section with all citations for easy reference
     formatted_output.append("="*50)
@@ -484,6 +738,19 @@ def get_full_content_from_url(url: str) -> str:
     except Exception as e:
         return f"Error retrieving content from {url}: {str(e)}"
 
+def find_dangerous_pattern(query: str) -> Optional[str]:
+    """
+    Find the first potentially dangerous pattern (script/scheme injection) in a query
+    
+    Args:
+        query: The search query string
+    
+    Returns:
+        The matched pattern in lowercase, or None if the query is safe
+    """
+    match = DANGEROUS_PATTERN_RE.search(query)
+    return match.group(0).lower() if match else None
+
 def validate_input(query, num_results):
     """
     Validate input parameters to prevent injection and ensure proper values
@@ -493,10 +760,9 @@ def validate_input(query, num_results):
         raise ValueError("Query must be a non-empty string")
     
     # Check for potentially dangerous patterns in query
-    dangerous_patterns = ['<script', 'javascript:', 'vbscript:', 'data:', 'file:', 'ftp:']
-    for pattern in dangerous_patterns:
-        if pattern.lower() in query.lower():
-            raise ValueError(f"Query contains potentially dangerous pattern: {pattern}")
+    pattern = find_dangerous_pattern(query)
+    if pattern:
+        raise ValueError(f"Query contains potentially dangerous pattern: {pattern}")
     
     # Validate number of results
     if not isinstance(num_results, int) or num_results <= 0 or num_results > 50:
@@ -540,16 +806,16 @@ def main():
             return
         
         # Check for potentially dangerous patterns in query
-        dangerous_patterns = ['<script', 'javascript:', 'vbscript:', 'data:', 'file:', 'ftp:']
-        for pattern in dangerous_patterns:
-            if pattern.lower() in query.lower():
-                print(f"Error: Query contains potentially dangerous pattern: {pattern}")
-                return
+        pattern = find_dangerous_pattern(query)
+        if pattern:
+            print(f"Error: Query contains potentially dangerous pattern: {pattern}")
+            return
         
         # Check if number of results is specified as second argument
         num_results = 10  # Default to 10 results for better LLM context
         include_full_content = False
         fetch_content = True  # Default to fetching content
+        force_fetch = False
         
         if len(sys.argv) > 2:
             try:
@@ -572,6 +838,8 @@ def main():
                     include_full_content = True
                 elif arg.lower() in ['no-fetch', 'no_fetch', '--no-fetch', 'summary', '--summary']:
                     fetch_content = False  # Option to disable content fetching
+                elif arg.lower() in ['force-fetch', 'force_fetch', '--force-fetch']:
+                    force_fetch = True  # Fetch pages even when the snippet is long enough
         
         # Validate inputs
         try:
@@ -585,7 +853,7 @@ def main():
         if results:
             # Rank the results for better LLM consumption
             ranked_results = rank_results(results)
-            formatted_output = format_results(ranked_results, include_full_content, fetch_content)
+            formatted_output = format_results(ranked_results, include_full_content, fetch_content, force_fetch)
             print(formatted_output)
             
             # Show truncated content information and provide instructions for fetching more information